@@ -1,42 +1,157 @@
+import functools
+import re
+import numpy as np
 import pandas as pd
-import json
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow  # noqa: F401
+    CSV_READ_OPTIONS = {"engine": "pyarrow"}
+except ImportError:
+    CSV_READ_OPTIONS = {"engine": "c", "low_memory": False, "cache_dates": True}
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    # The stdlib parser accepts bytes as well
+    from json import loads as json_loads
+
 # Open-Meteo CSVs have 2 metadata rows before the actual header
 METADATA_ROWS = 2
 
+# Open-Meteo dates are ISO calendar days
+DATE_FORMAT = "%Y-%m-%d"
+
+# CSVs bigger than this are parsed in chunks of CSV_CHUNK_ROWS rows
+CHUNKED_READ_MIN_BYTES = 10 * 1024 * 1024
+CSV_CHUNK_ROWS = 100_000
+
+# Directories with less raw data than this are extracted without a process pool
+PARALLEL_READ_MIN_BYTES = 10 * 1024 * 1024
+
+# Trailing unit suffix of a column name, e.g. ' (°C)'
+_UNIT_RE = re.compile(r"\s*\(.*?\)\s*$")
+
+# Known Open-Meteo column types, keyed on the cleaned column names
+COLUMN_DTYPES = {
+    "precipitation_sum": "float32",
+    "temperature_2m_max": "float32",
+    "temperature_2m_min": "float32",
+    "rain_sum": "float32",
+    "snowfall_sum": "float32",
+    "weather_code": "Int32",
+    "wind_speed_10m_max": "float32",
+}
+
+
+def _clean_names(columns: pd.Index) -> pd.Index:
+    # Drop the unit suffix, strip whitespace, spaces -> underscores
+    return pd.Index(
+        [_UNIT_RE.sub("", col).strip().replace(" ", "_") for col in columns]
+    )
+
 
 def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """Remove units from column names, e.g. 'temperature_2m_max (°C)' -> 'temperature_2m_max'."""
-    cleaned = {}
-    for col in df.columns:
-        # Take everything before the first '(' and strip whitespace
-        clean_name = col.split("(")[0].strip()
-        # Replace spaces with underscores
-        clean_name = clean_name.replace(" ", "_")
-        cleaned[col] = clean_name
-    df = df.rename(columns=cleaned)
+    df = df.set_axis(_clean_names(df.columns), axis=1)
     logger.debug(f"Cleaned columns: {list(df.columns)}")
     return df
 
 
+def apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the known Open-Meteo columns to their compact dtypes.
+
+    Unparseable cells such as '--' become missing values, which
+    handle_missing_values deals with later.
+    """
+    return df.assign(**{
+        col: pd.to_numeric(df[col], errors="coerce").astype(dtype)
+        for col, dtype in COLUMN_DTYPES.items()
+        if col in df.columns
+    })
+
+
+def typed_column(name: str, values: list):
+    """Build a column straight at its known dtype, skipping type inference.
+
+    Unparseable values become missing, like in apply_dtypes.
+    """
+    if name == "time":
+        return pd.to_datetime(values, format=DATE_FORMAT)
+    dtype = COLUMN_DTYPES.get(name)
+    if dtype is None:
+        return values
+    return pd.array(pd.to_numeric(values, errors="coerce"), dtype=dtype)
+
+
+@functools.lru_cache(maxsize=128)
 def extract_city_from_filename(filepath: str) -> str:
     """Extract city name from filename, e.g. 'berlin.csv' -> 'berlin'."""
     return Path(filepath).stem.lower()
 
 
+def city_column(filepath: str, length: int) -> pd.Categorical:
+    """Build the city column as a single-category Categorical."""
+    return pd.Categorical.from_codes(
+        np.zeros(length, dtype="int8"),
+        categories=[extract_city_from_filename(filepath)],
+    )
+
+
+def _prepare_frame(df: pd.DataFrame, filepath: str) -> pd.DataFrame:
+    """Clean and type freshly read columns and tag them with their source."""
+    df = clean_column_names(df)
+    df = apply_dtypes(df)
+    df["city"] = city_column(filepath, len(df))
+    df["source_file"] = Path(filepath).name
+    return df
+
+
+def iter_csv_chunks(filepath: str, chunksize: int | None = None):
+    """Yield an Open-Meteo CSV file as prepared DataFrames of chunksize rows.
+
+    Memory use is bounded by the chunk size rather than the file size.
+    """
+    # The pyarrow engine can't read in chunks
+    with pd.read_csv(
+        filepath,
+        header=METADATA_ROWS,
+        parse_dates=["time"],
+        date_format=DATE_FORMAT,
+        chunksize=chunksize or CSV_CHUNK_ROWS,
+        engine="c",
+        cache_dates=True,
+    ) as reader:
+        for chunk in reader:
+            yield _prepare_frame(chunk, filepath)
+
+
 def extract_csv(filepath: str) -> pd.DataFrame:
     """Extract data from an Open-Meteo CSV file."""
     logger.info(f"Extracting CSV: {filepath}")
 
-    # Skip the metadata rows (latitude, longitude, etc.)
-    df = pd.read_csv(filepath, skiprows=METADATA_ROWS)
-    df = clean_column_names(df)
-    df["city"] = extract_city_from_filename(filepath)
-    df["source_file"] = Path(filepath).name
+    if os.path.getsize(filepath) > CHUNKED_READ_MIN_BYTES:
+        # Only one chunk at a time is held at full parse width
+        df = pd.concat(iter_csv_chunks(filepath), ignore_index=True)
+    else:
+        # The real header comes after the metadata rows (latitude, longitude, etc.).
+        # header= rather than skiprows=, which the pyarrow engine ignores.
+        # Dates are parsed by the reader itself.
+        df = pd.read_csv(
+            filepath,
+            header=METADATA_ROWS,
+            parse_dates=["time"],
+            date_format=DATE_FORMAT,
+            **CSV_READ_OPTIONS,
+        )
+        df = _prepare_frame(df, filepath)
 
     logger.info(f"  -> {len(df)} rows extracted from {Path(filepath).name}")
     return df
@@ -46,36 +161,108 @@ def extract_json(filepath: str) -> pd.DataFrame:
     """Extract data from Open-Meteo JSON format."""
     logger.info(f"Extracting JSON: {filepath}")
 
-    with open(filepath, "r") as f:
-        data = json.load(f)
+    with open(filepath, "rb") as f:
+        data = json_loads(f.read())
 
     daily = data.get("daily", {})
-    df = pd.DataFrame(daily)
-    df = clean_column_names(df)
-    df["city"] = extract_city_from_filename(filepath)
-    df["source_file"] = Path(filepath).name
+    names = _clean_names(pd.Index(list(daily)))
+    df = pd.DataFrame({
+        name: typed_column(name, values)
+        for name, values in zip(names, daily.values())
+    })
+    df = _prepare_frame(df, filepath)
 
     logger.info(f"  -> {len(df)} rows extracted from {Path(filepath).name}")
     return df
 
 
-def extract_all(raw_dir: str) -> pd.DataFrame:
-    """Extract all CSV and JSON files from a directory into one DataFrame."""
+EXTRACTORS = {
+    ".csv": extract_csv,
+    ".json": extract_json,
+}
+
+
+def _extract_one(filepath: str) -> pd.DataFrame:
+    """Extract a single file with the extractor matching its suffix."""
+    return EXTRACTORS[Path(filepath).suffix](filepath)
+
+
+def _init_worker(log_queue, level: int):
+    """Send a worker process's log records back to the parent."""
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+
+def _extract_parallel(files: list, max_workers: int | None) -> list:
+    """Extract files in a pool of worker processes, preserving order."""
+    root = logging.getLogger()
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(log_queue, root.getEffectiveLevel()),
+    ) as executor:
+        results = executor.map(_extract_one, files)
+        # Only start the listener thread once the workers have been
+        # launched - forking a process with running threads is unsafe.
+        listener.start()
+        try:
+            frames = list(results)
+        finally:
+            # Workers flush their queued records on exit
+            executor.shutdown()
+            listener.stop()
+
+    return frames
+
+
+def _align_city_categories(frames: list) -> list:
+    """Give every frame's city column the same categories.
+
+    Otherwise concat falls back to plain strings for the column.
+    """
+    cities = sorted({city for df in frames for city in df["city"].cat.categories})
+    return [
+        df.assign(city=df["city"].cat.set_categories(cities)) for df in frames
+    ]
+
+
+def extract_all(raw_dir: str, max_workers: int | None = None) -> pd.DataFrame:
+    """Extract all CSV and JSON files from a directory into one DataFrame.
+
+    Once the files add up to PARALLEL_READ_MIN_BYTES they are parsed in
+    parallel worker processes; below that, starting the workers costs more
+    than it saves. An explicit max_workers overrides the size check, and
+    max_workers=1 always extracts in the current process.
+    """
     raw_path = Path(raw_dir)
-    frames = []
+    files = []
 
     for filepath in sorted(raw_path.iterdir()):
-        if filepath.suffix == ".csv":
-            frames.append(extract_csv(str(filepath)))
-        elif filepath.suffix == ".json":
-            frames.append(extract_json(str(filepath)))
+        if filepath.suffix in EXTRACTORS:
+            files.append(str(filepath))
         else:
             logger.warning(f"Skipping unsupported file: {filepath}")
 
-    if not frames:
+    if not files:
         logger.error(f"No CSV or JSON files found in {raw_dir}")
         return pd.DataFrame()
 
-    combined = pd.concat(frames, ignore_index=True)
+    if max_workers is None:
+        total_bytes = sum(os.path.getsize(filepath) for filepath in files)
+        if total_bytes < PARALLEL_READ_MIN_BYTES:
+            max_workers = 1
+
+    if max_workers == 1 or len(files) == 1:
+        frames = [_extract_one(filepath) for filepath in files]
+    else:
+        frames = _extract_parallel(files, max_workers)
+
+    # Matching dtypes let concat join the column blocks without upcasting
+    frames = _align_city_categories(frames)
+    combined = pd.concat(frames, ignore_index=True, sort=False)
     logger.info(f"Total extracted: {len(combined)} rows from {len(frames)} files")
-    return combined
\ No newline at end of file
+    return combined
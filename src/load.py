@@ -1,12 +1,32 @@
+import io
+from typing import Iterable
 import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import logging
 from config.settings import DATABASE
 
 logger = logging.getLogger(__name__)
 
-CREATE_TABLE_SQL = """
+# Derived columns are computed by Postgres, not sent by the loader
+GENERATED_COLUMNS = {
+    "temp_range": """FLOAT GENERATED ALWAYS AS (
+        temperature_2m_max - temperature_2m_min
+    ) STORED""",
+    "month": "INTEGER GENERATED ALWAYS AS (EXTRACT(MONTH FROM time)) STORED",
+    "day_of_week": """VARCHAR(10) GENERATED ALWAYS AS (
+        CASE EXTRACT(ISODOW FROM time)
+            WHEN 1 THEN 'Monday'
+            WHEN 2 THEN 'Tuesday'
+            WHEN 3 THEN 'Wednesday'
+            WHEN 4 THEN 'Thursday'
+            WHEN 5 THEN 'Friday'
+            WHEN 6 THEN 'Saturday'
+            WHEN 7 THEN 'Sunday'
+        END
+    ) STORED""",
+}
+
+CREATE_TABLE_SQL = f"""
 CREATE TABLE IF NOT EXISTS weather_data (
     id SERIAL PRIMARY KEY,
     city VARCHAR(50) NOT NULL,
@@ -18,20 +38,32 @@ CREATE TABLE IF NOT EXISTS weather_data (
     snowfall_sum FLOAT,
     weather_code INTEGER,
     wind_speed_10m_max FLOAT,
-    temp_range FLOAT,
-    month INTEGER,
-    day_of_week VARCHAR(10),
+    temp_range {GENERATED_COLUMNS["temp_range"]},
+    month {GENERATED_COLUMNS["month"]},
+    day_of_week {GENERATED_COLUMNS["day_of_week"]},
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(city, time)
 );
 """
 
+# Derived columns that an older schema created as plain columns
+PLAIN_DERIVED_COLUMNS_SQL = """
+SELECT column_name FROM information_schema.columns
+WHERE table_schema = current_schema()
+    AND table_name = 'weather_data'
+    AND column_name = ANY(%s)
+    AND is_generated = 'NEVER';
+"""
+
 UPSERT_SQL = """
 INSERT INTO weather_data (
     city, time, precipitation_sum, temperature_2m_max, temperature_2m_min,
-    rain_sum, snowfall_sum, weather_code, wind_speed_10m_max,
-    temp_range, month, day_of_week
-) VALUES %s
+    rain_sum, snowfall_sum, weather_code, wind_speed_10m_max
+)
+SELECT * FROM UNNEST(
+    %s::varchar[], %s::date[], %s::float8[], %s::float8[], %s::float8[],
+    %s::float8[], %s::float8[], %s::integer[], %s::float8[]
+)
 ON CONFLICT (city, time) DO UPDATE SET
     precipitation_sum = EXCLUDED.precipitation_sum,
     temperature_2m_max = EXCLUDED.temperature_2m_max,
@@ -39,22 +71,110 @@ ON CONFLICT (city, time) DO UPDATE SET
     rain_sum = EXCLUDED.rain_sum,
     snowfall_sum = EXCLUDED.snowfall_sum,
     weather_code = EXCLUDED.weather_code,
-    wind_speed_10m_max = EXCLUDED.wind_speed_10m_max,
-    temp_range = EXCLUDED.temp_range,
-    month = EXCLUDED.month,
-    day_of_week = EXCLUDED.day_of_week;
+    wind_speed_10m_max = EXCLUDED.wind_speed_10m_max;
+"""
+
+# Connections kept by the shared pool, created on first use
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8
+
+_POOL = None
+
+# Set once create_table() has run in this process
+_TABLE_READY = False
+
+# Batches at least this large are streamed with COPY into a staging table;
+# smaller ones go through a single INSERT ... SELECT FROM UNNEST.
+COPY_MIN_ROWS = 10_000
+
+COLUMNS = [
+    "city", "time", "precipitation_sum", "temperature_2m_max",
+    "temperature_2m_min", "rain_sum", "snowfall_sum", "weather_code",
+    "wind_speed_10m_max"
+]
+
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE weather_data_staging ON COMMIT DROP AS
+SELECT
+    city, time, precipitation_sum, temperature_2m_max, temperature_2m_min,
+    rain_sum, snowfall_sum, weather_code, wind_speed_10m_max
+FROM weather_data
+WITH NO DATA;
 """
 
+COPY_STAGING_SQL = """
+COPY weather_data_staging (
+    city, time, precipitation_sum, temperature_2m_max, temperature_2m_min,
+    rain_sum, snowfall_sum, weather_code, wind_speed_10m_max
+) FROM STDIN WITH (FORMAT csv)
+"""
+
+MERGE_STAGING_SQL = """
+INSERT INTO weather_data (
+    city, time, precipitation_sum, temperature_2m_max, temperature_2m_min,
+    rain_sum, snowfall_sum, weather_code, wind_speed_10m_max
+)
+SELECT
+    city, time, precipitation_sum, temperature_2m_max, temperature_2m_min,
+    rain_sum, snowfall_sum, weather_code, wind_speed_10m_max
+FROM weather_data_staging
+ON CONFLICT (city, time) DO UPDATE SET
+    precipitation_sum = EXCLUDED.precipitation_sum,
+    temperature_2m_max = EXCLUDED.temperature_2m_max,
+    temperature_2m_min = EXCLUDED.temperature_2m_min,
+    rain_sum = EXCLUDED.rain_sum,
+    snowfall_sum = EXCLUDED.snowfall_sum,
+    weather_code = EXCLUDED.weather_code,
+    wind_speed_10m_max = EXCLUDED.wind_speed_10m_max;
+"""
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadedConnectionPool(
+            POOL_MIN_CONNECTIONS,
+            POOL_MAX_CONNECTIONS,
+            host=DATABASE["host"],
+            port=DATABASE["port"],
+            dbname=DATABASE["dbname"],
+            user=DATABASE["user"],
+            password=DATABASE["password"],
+        )
+    return _POOL
+
 
 def get_connection():
-    """Create a database connection."""
-    return psycopg2.connect(
-        host=DATABASE["host"],
-        port=DATABASE["port"],
-        dbname=DATABASE["dbname"],
-        user=DATABASE["user"],
-        password=DATABASE["password"],
-    )
+    """Borrow a database connection from the pool.
+
+    Hand it back with release_connection() when done.
+    """
+    return _get_pool().getconn()
+
+
+def release_connection(conn):
+    """Return a connection borrowed with get_connection() to the pool."""
+    _get_pool().putconn(conn)
+
+
+def _migrate_generated_columns(cur):
+    """Turn derived columns of an older weather_data table into generated ones.
+
+    CREATE TABLE IF NOT EXISTS leaves an existing table alone, and the
+    loader no longer sends these columns, so plain ones would go stale.
+    """
+    cur.execute(PLAIN_DERIVED_COLUMNS_SQL, (list(GENERATED_COLUMNS),))
+    plain = [row[0] for row in cur.fetchall()]
+    if not plain:
+        return
+
+    changes = [
+        f"DROP COLUMN {col}, ADD COLUMN {col} {GENERATED_COLUMNS[col]}"
+        for col in plain
+    ]
+    cur.execute(f"ALTER TABLE weather_data {', '.join(changes)};")
+    logger.warning(f"Migrated weather_data columns to generated columns: {plain}")
 
 
 def create_table():
@@ -63,53 +183,107 @@ def create_table():
     try:
         with conn.cursor() as cur:
             cur.execute(CREATE_TABLE_SQL)
+            _migrate_generated_columns(cur)
         conn.commit()
         logger.info("Table 'weather_data' ready")
     finally:
-        conn.close()
+        release_connection(conn)
 
 
-def load(df: pd.DataFrame) -> int:
-    """Load DataFrame into Postgres using UPSERT (idempotent).
+def _ensure_table():
+    """Create the table on the first load in this process only."""
+    global _TABLE_READY
+    if not _TABLE_READY:
+        create_table()
+        _TABLE_READY = True
 
-    Returns the number of rows loaded.
+
+def _widen_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Widen float32 columns to float64 via their shortest decimal form.
+
+    A plain cast would turn 7.3 into 7.300000190734863 in the database.
     """
-    create_table()
+    for col in df.select_dtypes(include="float32").columns:
+        df[col] = df[col].to_numpy().astype(str).astype("float64")
+    return df
 
-    columns = [
-        "city", "time", "precipitation_sum", "temperature_2m_max",
-        "temperature_2m_min", "rain_sum", "snowfall_sum", "weather_code",
-        "wind_speed_10m_max", "temp_range", "month", "day_of_week"
-    ]
 
-    records = []
-    for _, row in df.iterrows():
-        record = []
-        for col in columns:
-            val = row[col]
-            if pd.isna(val):
-                record.append(None)
-            elif col == "time":
-                record.append(val.date())
-            elif col == "weather_code":
-                record.append(int(val) if pd.notna(val) else None)
-            else:
-                record.append(val)
-        records.append(tuple(record))
+def build_arrays(df: pd.DataFrame, columns: list) -> list:
+    """Convert a DataFrame into one list per column, ready for UNNEST.
 
-    conn = get_connection()
+    Dates are converted once, missing values of any dtype become None,
+    and numpy scalars become plain Python objects psycopg2 can adapt.
+    """
+    sub = _widen_floats(df.reindex(columns=columns))
+    sub["time"] = sub["time"].dt.date
+    sub = sub.astype(object).where(sub.notna(), None)
+    return [sub[col].tolist() for col in columns]
+
+
+def copy_upsert(cur, df: pd.DataFrame) -> None:
+    """Upsert a DataFrame by streaming it as CSV through COPY.
+
+    Rows land in a temporary staging table first, then get merged into
+    weather_data with a single INSERT ... SELECT ... ON CONFLICT.
+    """
+    buf = io.StringIO()
+    df.reindex(columns=COLUMNS).to_csv(
+        buf, index=False, header=False, date_format="%Y-%m-%d"
+    )
+    buf.seek(0)
+
+    cur.execute(CREATE_STAGING_SQL)
+    cur.copy_expert(COPY_STAGING_SQL, buf)
+    cur.execute(MERGE_STAGING_SQL)
+    # Drop it right away so another load in the same transaction can reuse the name
+    cur.execute("DROP TABLE weather_data_staging;")
+
+
+def _upsert(cur, df: pd.DataFrame) -> None:
+    """Upsert one batch, picking COPY or UNNEST by its size."""
+    if len(df) >= COPY_MIN_ROWS:
+        copy_upsert(cur, df)
+    else:
+        cur.execute(UPSERT_SQL, build_arrays(df, COLUMNS))
+
+
+def load(df: pd.DataFrame | Iterable[pd.DataFrame], conn=None) -> int:
+    """Load DataFrame(s) into Postgres using UPSERT (idempotent).
+
+    Takes a single DataFrame or an iterable of chunks. Chunks are upserted
+    one by one over the same connection and committed together at the end,
+    so only one chunk needs to be in memory at a time.
+    Pass an open connection to run several loads in one transaction;
+    committing it is then left to the caller.
+
+    Returns the number of rows loaded.
+    """
+    if isinstance(df, pd.DataFrame):
+        df = [df]
+
+    _ensure_table()
+
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_connection()
     try:
+        loaded = 0
         with conn.cursor() as cur:
-            execute_values(cur, UPSERT_SQL, records, page_size=500)
-        conn.commit()
-        logger.info(f"Loaded {len(df)} rows into weather_data (upsert)")
-        return len(df)
+            for chunk in df:
+                _upsert(cur, chunk)
+                loaded += len(chunk)
+        if owns_conn:
+            conn.commit()
+        logger.info(f"Loaded {loaded} rows into weather_data (upsert)")
+        return loaded
     except Exception as e:
-        conn.rollback()
+        if owns_conn:
+            conn.rollback()
         logger.error(f"Load failed: {e}")
         raise
     finally:
-        conn.close()
+        if owns_conn:
+            release_connection(conn)
 
 
 def get_row_count() -> int:
@@ -120,4 +294,4 @@ def get_row_count() -> int:
             cur.execute("SELECT COUNT(*) FROM weather_data;")
             return cur.fetchone()[0]
     finally:
-        conn.close()
\ No newline at end of file
+        release_connection(conn)
\ No newline at end of file
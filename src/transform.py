@@ -4,55 +4,85 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def validate_temperature(df: pd.DataFrame) -> pd.DataFrame:
-    """Flag rows with unrealistic temperatures (outside -60 to 60°C)."""
-    mask = (
+def _invalid_temperature_mask(df: pd.DataFrame) -> pd.Series:
+    """Rows with temperatures outside -60 to 60°C."""
+    return (
         (df["temperature_2m_max"] < -60) | (df["temperature_2m_max"] > 60) |
         (df["temperature_2m_min"] < -60) | (df["temperature_2m_min"] > 60)
     )
-    rejected = df[mask]
-    if len(rejected) > 0:
-        logger.warning(f"Rejected {len(rejected)} rows with invalid temperatures")
-        for _, row in rejected.iterrows():
-            logger.warning(
-                f"  REJECTED: {row['city']} {row['time']} "
-                f"max={row['temperature_2m_max']} min={row['temperature_2m_min']}"
-            )
-    return df[~mask].copy()
 
 
-def validate_precipitation(df: pd.DataFrame) -> pd.DataFrame:
-    """Flag rows with negative precipitation."""
+def _negative_precipitation_mask(df: pd.DataFrame) -> pd.Series:
+    """Rows with a negative value in any precipitation column."""
     precip_cols = ["precipitation_sum", "rain_sum", "snowfall_sum"]
     existing_cols = [c for c in precip_cols if c in df.columns]
 
     mask = pd.Series(False, index=df.index)
     for col in existing_cols:
         mask = mask | (df[col] < 0)
+    return mask
 
-    rejected = df[mask]
+
+def _log_temperature_rejects(rejected: pd.DataFrame):
+    # One message for all rejects, and no formatting if nobody listens
+    if len(rejected) > 0 and logger.isEnabledFor(logging.WARNING):
+        cols = ["city", "time", "temperature_2m_max", "temperature_2m_min"]
+        logger.warning(
+            "Rejected %d rows with invalid temperatures:\n%s",
+            len(rejected), rejected[cols].to_string(index=False),
+        )
+
+
+def _log_precipitation_rejects(rejected: pd.DataFrame):
     if len(rejected) > 0:
         logger.warning(f"Rejected {len(rejected)} rows with negative precipitation")
-    return df[~mask].copy()
+
+
+def validate_temperature(df: pd.DataFrame) -> pd.DataFrame:
+    """Flag rows with unrealistic temperatures (outside -60 to 60°C)."""
+    mask = _invalid_temperature_mask(df)
+    _log_temperature_rejects(df[mask])
+    return df[~mask]
+
+
+def validate_precipitation(df: pd.DataFrame) -> pd.DataFrame:
+    """Flag rows with negative precipitation."""
+    mask = _negative_precipitation_mask(df)
+    _log_precipitation_rejects(df[mask])
+    return df[~mask]
+
+
+def validate(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply all validation rules in one pass with a single filter.
+
+    Same result as validate_temperature followed by validate_precipitation.
+    """
+    temp_mask = _invalid_temperature_mask(df)
+    # Count rows under the first rule they break, as the chained validators do
+    precip_mask = _negative_precipitation_mask(df) & ~temp_mask
+    _log_temperature_rejects(df[temp_mask])
+    _log_precipitation_rejects(df[precip_mask])
+    return df[~(temp_mask | precip_mask)]
 
 
 def cast_types(df: pd.DataFrame) -> pd.DataFrame:
     """Cast columns to proper types."""
-    # Parse date
-    df["time"] = pd.to_datetime(df["time"], format="%Y-%m-%d")
+    # Parse date, unless the extractor already did
+    if not pd.api.types.is_datetime64_any_dtype(df["time"]):
+        df["time"] = pd.to_datetime(df["time"], format="%Y-%m-%d")
 
-    # Ensure numeric columns are float
+    # Ensure numeric columns are float32 - plenty for 0.1-precision readings
     numeric_cols = [
         "precipitation_sum", "temperature_2m_max", "temperature_2m_min",
         "rain_sum", "snowfall_sum", "wind_speed_10m_max"
     ]
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = pd.to_numeric(df[col], errors="coerce", downcast="float")
 
-    # Weather code should be integer (nullable)
+    # Weather code should be integer (nullable), Int32 like the extractors produce
     if "weather_code" in df.columns:
-        df["weather_code"] = pd.to_numeric(df["weather_code"], errors="coerce").astype("Int64")
+        df["weather_code"] = pd.to_numeric(df["weather_code"], errors="coerce").astype("Int32")
 
     logger.info("Type casting complete")
     return df
@@ -65,18 +95,25 @@ def handle_missing_values(df: pd.DataFrame, strategy: str = "drop") -> pd.DataFr
         strategy: 'drop' to remove rows, 'fill_zero' to fill with 0,
                   'fill_mean' to fill with column mean
     """
-    missing_count = df.isna().sum().sum()
-    if missing_count == 0:
+    # dropna is a no-op on clean data, so skip the separate missing-value scan
+    if strategy == "drop":
+        before = len(df)
+        df = df.dropna()
+        dropped = before - len(df)
+        if dropped > 0:
+            logger.info(f"Dropped {dropped} rows with missing values, strategy: drop")
+        else:
+            logger.info("No missing values found")
+        return df
+
+    # A yes/no answer is enough here, no need to count every missing cell
+    if not df.isna().any().any():
         logger.info("No missing values found")
         return df
 
-    logger.info(f"Found {missing_count} missing values, strategy: {strategy}")
+    logger.info(f"Found missing values, strategy: {strategy}")
 
-    if strategy == "drop":
-        before = len(df)
-        df = df.dropna()
-        logger.info(f"Dropped {before - len(df)} rows with missing values")
-    elif strategy == "fill_zero":
+    if strategy == "fill_zero":
         numeric_cols = df.select_dtypes(include="number").columns
         df[numeric_cols] = df[numeric_cols].fillna(0)
     elif strategy == "fill_mean":
@@ -100,19 +137,6 @@ def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def add_computed_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Add useful derived columns."""
-    # Temperature range for the day
-    df["temp_range"] = df["temperature_2m_max"] - df["temperature_2m_min"]
-
-    # Month and day of week for analysis
-    df["month"] = df["time"].dt.month
-    df["day_of_week"] = df["time"].dt.day_name()
-
-    logger.info("Added computed columns: temp_range, month, day_of_week")
-    return df
-
-
 def transform(df: pd.DataFrame, missing_strategy: str = "drop") -> pd.DataFrame:
     """Run the full transformation pipeline."""
     logger.info(f"Starting transform: {len(df)} rows")
@@ -120,12 +144,12 @@ def transform(df: pd.DataFrame, missing_strategy: str = "drop") -> pd.DataFrame:
     # Drop the source_file column - not needed in final data
     df = df.drop(columns=["source_file"], errors="ignore")
 
-    df = remove_duplicates(df)
+    # Cast first so dedup hashes datetime64 values instead of date strings
     df = cast_types(df)
+    df = remove_duplicates(df)
     df = handle_missing_values(df, strategy=missing_strategy)
-    df = validate_temperature(df)
-    df = validate_precipitation(df)
-    df = add_computed_columns(df)
+    df = validate(df)
+    # temp_range, month and day_of_week are generated columns in Postgres
 
     df = df.reset_index(drop=True)
     logger.info(f"Transform complete: {len(df)} rows remaining")
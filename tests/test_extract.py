@@ -2,7 +2,9 @@ import pytest
 import pandas as pd
 import json
 import os
-from src.extract import extract_csv, extract_json, extract_all, clean_column_names
+from src.extract import (
+    extract_csv, extract_json, extract_all, clean_column_names, iter_csv_chunks
+)
 
 
 @pytest.fixture
@@ -54,6 +56,40 @@ def test_extract_csv_has_source_file(sample_csv):
     assert df["source_file"].iloc[0] == "test_city.csv"
 
 
+def test_extract_csv_compact_dtypes(sample_csv):
+    df = extract_csv(sample_csv)
+    assert df["temperature_2m_max"].dtype == "float32"
+    assert "datetime64" in str(df["time"].dtype)
+    assert df["time"].iloc[0] == pd.Timestamp("2024-01-01")
+
+
+def test_extract_csv_coerces_non_numeric(tmp_path):
+    content = "latitude,longitude,elevation\n52.5,13.4,38.0\ntime,temperature_2m_max,weather_code\n2024-01-01,7.3,53\n2024-01-02,--,61\n2024-01-03,10.6,--\n"
+    filepath = tmp_path / "test_city.csv"
+    filepath.write_text(content, encoding="utf-8")
+    df = extract_csv(str(filepath))
+    assert len(df) == 3
+    assert df["temperature_2m_max"].dtype == "float32"
+    assert df["temperature_2m_max"].isna().iloc[1]
+    assert df["weather_code"].dtype == "Int32"
+    assert df["weather_code"].isna().iloc[2]
+
+
+def test_iter_csv_chunks(sample_csv):
+    chunks = list(iter_csv_chunks(sample_csv, chunksize=2))
+    assert [len(c) for c in chunks] == [2, 1]
+    assert "temperature_2m_max" in chunks[0].columns
+    assert chunks[1]["city"].iloc[0] == "test_city"
+
+
+def test_extract_csv_chunked_matches_full(sample_csv, monkeypatch):
+    full = extract_csv(sample_csv)
+    monkeypatch.setattr("src.extract.CHUNKED_READ_MIN_BYTES", 0)
+    monkeypatch.setattr("src.extract.CSV_CHUNK_ROWS", 2)
+    chunked = extract_csv(sample_csv)
+    pd.testing.assert_frame_equal(chunked, full)
+
+
 def test_extract_json_row_count(sample_json):
     df = extract_json(sample_json)
     assert len(df) == 2
@@ -64,6 +100,25 @@ def test_extract_json_has_city_column(sample_json):
     assert "city" in df.columns
 
 
+def test_extract_json_typed_columns(tmp_path):
+    data = {
+        "daily": {
+            "time": ["2024-01-01", "2024-01-02", "2024-01-03"],
+            "temperature_2m_max (°C)": [7.3, None, "bad"],
+            "weather_code (wmo code)": [53, None, "bad"],
+        }
+    }
+    filepath = tmp_path / "test_city.json"
+    filepath.write_text(json.dumps(data))
+    df = extract_json(str(filepath))
+    assert df["temperature_2m_max"].dtype == "float32"
+    assert df["temperature_2m_max"].isna().iloc[1:].all()
+    assert df["weather_code"].dtype == "Int32"
+    assert df["weather_code"].iloc[0] == 53
+    assert df["weather_code"].isna().iloc[1:].all()
+    assert df["time"].iloc[1] == pd.Timestamp("2024-01-02")
+
+
 def test_clean_column_names():
     df = pd.DataFrame({"temperature_2m_max (°C)": [1], "rain_sum (mm)": [2]})
     df = clean_column_names(df)
@@ -83,4 +138,30 @@ def test_extract_all_combines_files(tmp_path):
         (tmp_path / f"{city}.csv").write_text(content, encoding="utf-8")
     df = extract_all(str(tmp_path))
     assert len(df) == 2
-    assert set(df["city"]) == {"a", "b"}
\ No newline at end of file
+    assert set(df["city"]) == {"a", "b"}
+    assert df["city"].dtype == "category"
+
+
+def test_extract_all_sequential_matches_parallel(tmp_path):
+    """Test that parallel extraction keeps the sorted file order."""
+    for city in ["c", "a", "b"]:
+        content = "lat,lon,elev\n1,2,3\ntime,temp\n2024-01-01,5.0\n"
+        (tmp_path / f"{city}.csv").write_text(content, encoding="utf-8")
+    parallel = extract_all(str(tmp_path), max_workers=2)
+    sequential = extract_all(str(tmp_path), max_workers=1)
+    assert list(parallel["city"]) == ["a", "b", "c"]
+    pd.testing.assert_frame_equal(parallel, sequential)
+
+
+def test_extract_all_small_input_skips_pool(tmp_path, monkeypatch):
+    """Test that small directories are extracted without worker processes."""
+    for city in ["a", "b"]:
+        content = "lat,lon,elev\n1,2,3\ntime,temp\n2024-01-01,5.0\n"
+        (tmp_path / f"{city}.csv").write_text(content, encoding="utf-8")
+
+    def no_pool(files, max_workers):
+        raise AssertionError("process pool started")
+
+    monkeypatch.setattr("src.extract._extract_parallel", no_pool)
+    df = extract_all(str(tmp_path))
+    assert len(df) == 2
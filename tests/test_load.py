@@ -1,6 +1,8 @@
 import pytest
 import psycopg2
-from src.load import get_connection, create_table, load, get_row_count
+from src.load import (
+    get_connection, release_connection, create_table, load, get_row_count
+)
 import pandas as pd
 
 
@@ -12,14 +14,61 @@ def clean_table():
     with conn.cursor() as cur:
         cur.execute("DELETE FROM weather_data;")
     conn.commit()
-    conn.close()
+    release_connection(conn)
     yield
     # Cleanup after test
     conn = get_connection()
     with conn.cursor() as cur:
         cur.execute("DELETE FROM weather_data;")
     conn.commit()
-    conn.close()
+    release_connection(conn)
+
+
+OLD_SCHEMA_SQL = """
+CREATE TABLE weather_data (
+    id SERIAL PRIMARY KEY,
+    city VARCHAR(50) NOT NULL,
+    time DATE NOT NULL,
+    precipitation_sum FLOAT,
+    temperature_2m_max FLOAT,
+    temperature_2m_min FLOAT,
+    rain_sum FLOAT,
+    snowfall_sum FLOAT,
+    weather_code INTEGER,
+    wind_speed_10m_max FLOAT,
+    temp_range FLOAT,
+    month INTEGER,
+    day_of_week VARCHAR(10),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(city, time)
+);
+"""
+
+
+@pytest.fixture
+def old_schema_table(monkeypatch):
+    """Replace the table with the pre-generated-columns schema and one row."""
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS weather_data;")
+        cur.execute(OLD_SCHEMA_SQL)
+        cur.execute("""
+            INSERT INTO weather_data (
+                city, time, temperature_2m_max, temperature_2m_min,
+                temp_range, month, day_of_week
+            ) VALUES ('berlin', '2024-01-01', 7.3, 3.4, 3.9, 1, 'Monday');
+        """)
+    conn.commit()
+    release_connection(conn)
+    # Make load() run create_table() again, as in a fresh process
+    monkeypatch.setattr("src.load._TABLE_READY", False)
+    yield
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS weather_data;")
+    conn.commit()
+    release_connection(conn)
+    create_table()
 
 
 @pytest.fixture
@@ -35,9 +84,6 @@ def sample_df():
         "snowfall_sum": [0.0, 0.0, 0.0],
         "weather_code": pd.array([53, 61, 63], dtype="Int64"),
         "wind_speed_10m_max": [19.7, 20.2, 27.8],
-        "temp_range": [3.9, 4.7, 3.4],
-        "month": [1, 1, 1],
-        "day_of_week": ["Monday", "Tuesday", "Wednesday"],
     })
 
 
@@ -45,7 +91,17 @@ def test_connection():
     """Test that we can connect to the database."""
     conn = get_connection()
     assert conn is not None
-    conn.close()
+    release_connection(conn)
+
+
+def test_connection_is_reused():
+    """Test that a released connection is handed out again."""
+    conn = get_connection()
+    release_connection(conn)
+    again = get_connection()
+    release_connection(again)
+    assert again is conn
+    assert not again.closed
 
 
 def test_create_table():
@@ -60,7 +116,7 @@ def test_create_table():
             );
         """)
         exists = cur.fetchone()[0]
-    conn.close()
+    release_connection(conn)
     assert exists is True
 
 
@@ -93,7 +149,7 @@ def test_load_upsert_updates(clean_table, sample_df):
             WHERE city = 'berlin' AND time = '2024-01-01';
         """)
         val = cur.fetchone()[0]
-    conn.close()
+    release_connection(conn)
     assert val == 99.0
 
 
@@ -109,16 +165,141 @@ def test_load_multiple_cities(clean_table):
         "snowfall_sum": [0.0, 0.0],
         "weather_code": pd.array([53, 61], dtype="Int64"),
         "wind_speed_10m_max": [19.7, 15.0],
-        "temp_range": [3.9, 4.0],
-        "month": [1, 1],
-        "day_of_week": ["Monday", "Monday"],
     })
     load(df)
     assert get_row_count() == 2
 
 
+def test_load_generated_columns(clean_table, sample_df):
+    """Test that Postgres fills in the derived columns."""
+    load(sample_df)
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT temp_range, month, day_of_week FROM weather_data
+            WHERE city = 'berlin' AND time = '2024-01-02';
+        """)
+        temp_range, month, day_of_week = cur.fetchone()
+    release_connection(conn)
+    assert temp_range == pytest.approx(4.7)
+    assert month == 1
+    assert day_of_week == "Tuesday"
+
+
 def test_get_row_count(clean_table, sample_df):
     """Test row count before and after loading."""
     assert get_row_count() == 0
     load(sample_df)
-    assert get_row_count() == 3
\ No newline at end of file
+    assert get_row_count() == 3
+
+
+def test_load_copy_path(clean_table, sample_df, monkeypatch):
+    """Test that the COPY + staging path upserts like the INSERT path."""
+    monkeypatch.setattr("src.load.COPY_MIN_ROWS", 1)
+    load(sample_df)
+    sample_df.loc[0, "temperature_2m_max"] = 99.0
+    load(sample_df)
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT temperature_2m_max, weather_code, day_of_week FROM weather_data
+            WHERE city = 'berlin' AND time = '2024-01-01';
+        """)
+        row = cur.fetchone()
+    release_connection(conn)
+    assert get_row_count() == 3
+    assert row == (99.0, 53, "Monday")
+
+
+def test_load_with_shared_connection(clean_table, sample_df, monkeypatch):
+    """Test several loads in one caller-managed transaction."""
+    monkeypatch.setattr("src.load.COPY_MIN_ROWS", 2)
+    conn = get_connection()
+    try:
+        load(sample_df, conn=conn)
+        load(sample_df.iloc[:1], conn=conn)
+        load(sample_df, conn=conn)
+        assert get_row_count() == 0
+        conn.commit()
+    finally:
+        release_connection(conn)
+    assert get_row_count() == 3
+
+
+def test_load_float32_values_exact(clean_table, sample_df):
+    """Test that float32 columns are stored without widening artifacts."""
+    sample_df["temperature_2m_max"] = sample_df["temperature_2m_max"].astype("float32")
+    load(sample_df)
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT temperature_2m_max FROM weather_data
+            WHERE city = 'berlin' AND time = '2024-01-01';
+        """)
+        val = cur.fetchone()[0]
+    release_connection(conn)
+    assert val == 7.3
+
+
+def test_load_missing_values_as_null(clean_table, sample_df):
+    """Test that NaN and <NA> values are stored as NULL."""
+    sample_df.loc[0, "precipitation_sum"] = float("nan")
+    sample_df.loc[0, "weather_code"] = pd.NA
+    load(sample_df)
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT precipitation_sum, weather_code FROM weather_data
+            WHERE city = 'berlin' AND time = '2024-01-01';
+        """)
+        row = cur.fetchone()
+    release_connection(conn)
+    assert row == (None, None)
+
+
+def test_load_chunks(clean_table, sample_df):
+    """Test loading an iterator of DataFrame chunks."""
+    chunks = (sample_df.iloc[i:i + 2] for i in range(0, len(sample_df), 2))
+    loaded = load(chunks)
+    assert loaded == 3
+    assert get_row_count() == 3
+
+
+def test_load_chunks_rolls_back_on_error(clean_table, sample_df):
+    """Test that a failing chunk rolls back the chunks before it."""
+    def chunks():
+        yield sample_df.iloc[:2]
+        raise RuntimeError("extract failed")
+
+    with pytest.raises(RuntimeError):
+        load(chunks())
+    assert get_row_count() == 0
+
+
+def test_load_migrates_old_schema(old_schema_table, sample_df):
+    """Test that derived columns of an old table are recomputed on load."""
+    sample_df.loc[0, "temperature_2m_max"] = 12.3
+    load(sample_df)
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT time, temp_range, month, day_of_week FROM weather_data
+            ORDER BY time;
+        """)
+        rows = cur.fetchall()
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'weather_data' AND is_generated = 'ALWAYS'
+            ORDER BY column_name;
+        """)
+        generated = [row[0] for row in cur.fetchall()]
+    release_connection(conn)
+    assert generated == ["day_of_week", "month", "temp_range"]
+    assert rows[0][1] == pytest.approx(8.9)
+    assert rows[1][1:] == (pytest.approx(4.7), 1, "Tuesday")
+    assert rows[2][3] == "Wednesday"
@@ -2,8 +2,7 @@ import pytest
 import pandas as pd
 from src.transform import (
     remove_duplicates, cast_types, validate_temperature,
-    validate_precipitation, handle_missing_values,
-    add_computed_columns, transform
+    validate_precipitation, validate, handle_missing_values, transform
 )
 
 
@@ -47,7 +46,8 @@ def test_remove_duplicates_different_cities():
 def test_cast_types(sample_df):
     result = cast_types(sample_df)
     assert result["time"].dtype == "datetime64[ns]" or "datetime64" in str(result["time"].dtype)
-    assert result["precipitation_sum"].dtype == "float64"
+    assert result["precipitation_sum"].dtype == "float32"
+    assert result["weather_code"].dtype == "Int32"
 
 
 def test_validate_temperature_rejects_extreme():
@@ -61,6 +61,20 @@ def test_validate_temperature_rejects_extreme():
     assert len(result) == 1
 
 
+def test_validate_temperature_logs_rejects_once(caplog):
+    df = pd.DataFrame({
+        "time": ["2024-01-01", "2024-01-02", "2024-01-03"],
+        "city": ["berlin", "berlin", "berlin"],
+        "temperature_2m_max": [7.3, 100.0, 7.2],
+        "temperature_2m_min": [3.4, 2.5, -80.0],
+    })
+    with caplog.at_level("WARNING", logger="src.transform"):
+        validate_temperature(df)
+    assert len(caplog.records) == 1
+    assert "Rejected 2 rows" in caplog.text
+    assert "2024-01-03" in caplog.text
+
+
 def test_validate_temperature_passes_normal(sample_df):
     result = validate_temperature(sample_df)
     assert len(result) == len(sample_df)
@@ -76,6 +90,22 @@ def test_validate_precipitation_rejects_negative():
     assert len(result) == 1
 
 
+def test_validate_matches_chained_validators():
+    df = pd.DataFrame({
+        "time": ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"],
+        "city": ["berlin", "berlin", "berlin", "berlin"],
+        "temperature_2m_max": [7.3, 100.0, 7.2, 100.0],
+        "temperature_2m_min": [3.4, 2.5, 2.5, 2.5],
+        "precipitation_sum": [1.0, 1.0, -5.0, -5.0],
+        "rain_sum": [1.0, 1.0, 1.0, 1.0],
+        "snowfall_sum": [0.0, 0.0, 0.0, 0.0],
+    })
+    expected = validate_precipitation(validate_temperature(df))
+    result = validate(df)
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(result["time"]) == ["2024-01-01"]
+
+
 def test_handle_missing_drop():
     df = pd.DataFrame({"a": [1.0, None, 3.0], "b": [4.0, 5.0, 6.0]})
     result = handle_missing_values(df, strategy="drop")
@@ -94,17 +124,14 @@ def test_handle_missing_fill_mean():
     assert result["a"].iloc[1] == 2.0
 
 
-def test_add_computed_columns(sample_df):
-    sample_df["time"] = pd.to_datetime(sample_df["time"])
-    result = add_computed_columns(sample_df)
-    assert "temp_range" in result.columns
-    assert "month" in result.columns
-    assert "day_of_week" in result.columns
-    assert result["temp_range"].iloc[0] == pytest.approx(3.9)
-
-
 def test_full_transform(sample_df):
     result = transform(sample_df)
     assert "source_file" not in result.columns
-    assert "temp_range" in result.columns
-    assert len(result) == 3
\ No newline at end of file
+    assert "temp_range" not in result.columns
+    assert len(result) == 3
+
+
+def test_full_transform_removes_duplicates(sample_df):
+    df = pd.concat([sample_df, sample_df.iloc[:1]], ignore_index=True)
+    result = transform(df)
+    assert len(result) == 3